@@ -37,6 +37,10 @@ class Config:
     
     # Trading Constraints (Intraday)
     MAX_HOLDING_MINUTES = 390  # Full trading day (6.5 hours)
+
+    # Backtest executor: 'thread' (default) or 'process' for CPU-bound
+    # universes large enough to justify pickling data to workers
+    BACKTEST_EXECUTOR = os.getenv('BACKTEST_EXECUTOR', 'thread').lower()
     
     # API Settings
     INSTRUMENTS_URL = "https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json"
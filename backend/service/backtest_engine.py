@@ -1,282 +1,397 @@
-import pandas as pd
-import logging
-from datetime import datetime, time
-from typing import List, Dict
-from backend.utils.pattern_detector import PatternDetector
-from backend.config import Config
-
-logger = logging.getLogger(__name__)
-
-class BacktestEngine:
-    """Backtesting engine for candlestick patterns"""
-    
-    def __init__(self):
-        self.pattern_detector = PatternDetector()
-        self.market_open = time(9, 15)
-        self.market_close = time(15, 30)
-    
-    async def run_backtest(
-        self,
-        historical_data: Dict[str, pd.DataFrame],
-        strategy: str,
-        target_percent: float,
-        stop_loss_percent: float
-    ) -> Dict:
-        """
-        Run backtest on historical data
-        
-        Args:
-            historical_data: Dict of {symbol: DataFrame}
-            strategy: 'hammer' or 'inverted_hammer'
-            target_percent: Target profit percentage
-            stop_loss_percent: Stop loss percentage
-        
-        Returns:
-            Dict with backtest results
-        """
-        logger.info(f"Starting {strategy} backtest for {len(historical_data)} stocks")
-        
-        all_trades = []
-        total_target_hits = 0
-        total_stop_losses = 0
-        total_eod_exits = 0
-        total_points = 0.0
-        
-        for symbol, df in historical_data.items():
-            try:
-                logger.info(f"Analyzing {symbol}...")
-                
-                # Detect patterns
-                if strategy == 'hammer':
-                    patterns = self.pattern_detector.detect_hammer(df)
-                elif strategy == 'inverted_hammer':
-                    patterns = self.pattern_detector.detect_inverted_hammer(df)
-                else:
-                    logger.error(f"Unknown strategy: {strategy}")
-                    continue
-                
-                if not patterns:
-                    logger.info(f"No {strategy} patterns found for {symbol}")
-                    continue
-                
-                logger.info(f"Found {len(patterns)} {strategy} patterns in {symbol}")
-                
-                # Test each pattern
-                for pattern in patterns:
-                    trade_result = self._simulate_trade(
-                        symbol=symbol,
-                        pattern=pattern,
-                        df=df,
-                        target_percent=target_percent,
-                        stop_loss_percent=stop_loss_percent
-                    )
-                    
-                    if trade_result:
-                        all_trades.append(trade_result)
-                        
-                        # Update counters
-                        if trade_result['outcome'] == 'target_hit':
-                            total_target_hits += 1
-                        elif trade_result['outcome'] == 'stop_loss':
-                            total_stop_losses += 1
-                        else:
-                            total_eod_exits += 1
-                        
-                        total_points += trade_result['points_gained']
-                
-            except Exception as e:
-                logger.error(f"Error processing {symbol}: {e}")
-                continue
-        
-        # Calculate summary statistics
-        total_patterns = len(all_trades)
-        
-        if total_patterns == 0:
-            return self._empty_result(strategy)
-        
-        target_hit_rate = (total_target_hits / total_patterns) * 100
-        stop_loss_rate = (total_stop_losses / total_patterns) * 100
-        avg_return = sum(t['percentage_return'] for t in all_trades) / total_patterns
-        
-        logger.info(f"✅ Backtest completed: {total_patterns} trades analyzed")
-        
-        return {
-            'total_patterns': total_patterns,
-            'target_hit_count': total_target_hits,
-            'stop_loss_count': total_stop_losses,
-            'eod_exit_count': total_eod_exits,
-            'target_hit_rate': round(target_hit_rate, 2),
-            'stop_loss_rate': round(stop_loss_rate, 2),
-            'avg_return': round(avg_return, 2),
-            'total_points_gained': round(total_points, 2),
-            'trades': all_trades
-        }
-    
-    def _simulate_trade(
-        self,
-        symbol: str,
-        pattern: Dict,
-        df: pd.DataFrame,
-        target_percent: float,
-        stop_loss_percent: float
-    ) -> Dict:
-        """
-        Simulate a single trade based on pattern
-        NOW TRACKS: Maximum profit reached during trade
-        
-        Returns:
-            Dict with trade details including max_profit_reached
-        """
-        try:
-            # Pattern formed at this time
-            pattern_time = pattern['timestamp']
-            
-            # Entry at next candle (already in pattern dict)
-            entry_time = pattern['entry_timestamp']
-            entry_price = pattern['entry_price']
-            
-            # Calculate target and stop loss prices
-            target_price = entry_price * (1 + target_percent / 100)
-            stop_loss_price = entry_price * (1 - stop_loss_percent / 100)
-            
-            # Get future candles AFTER entry (same day only)
-            future_candles = df[df.index > entry_time].copy()
-            
-            if future_candles.empty:
-                return None
-            
-            # Filter same day candles only (intraday)
-            entry_date = entry_time.date()
-            same_day_candles = future_candles[
-                future_candles.index.date == entry_date
-            ]
-            
-            if same_day_candles.empty:
-                return None
-            
-            # Initialize tracking variables
-            exit_price = entry_price
-            exit_time = entry_time
-            exit_reason = 'eod_exit'
-            outcome = 'eod_exit'
-            minutes_held = 0
-            candles_held = 0
-            
-            # NEW: Track maximum profit reached
-            max_profit_points = 0.0  # Maximum profit in points
-            max_profit_percent = 0.0  # Maximum profit in percentage
-            max_loss_points = 0.0  # Maximum loss (for additional insight)
-            
-            for idx, (timestamp, candle) in enumerate(same_day_candles.iterrows(), 1):
-                high_price = float(candle['high'])
-                low_price = float(candle['low'])
-                close_price = float(candle['close'])
-                
-                # Track maximum profit reached (from HIGH of each candle)
-                profit_at_high = high_price - entry_price
-                if profit_at_high > max_profit_points:
-                    max_profit_points = profit_at_high
-                    max_profit_percent = (profit_at_high / entry_price) * 100
-                
-                # Track maximum loss reached (from LOW of each candle)
-                loss_at_low = entry_price - low_price
-                if loss_at_low > max_loss_points:
-                    max_loss_points = loss_at_low
-                
-                # Check if target hit (priority)
-                if high_price >= target_price:
-                    exit_price = target_price
-                    exit_time = timestamp
-                    exit_reason = 'Target hit'
-                    outcome = 'target_hit'
-                    minutes_held = (timestamp - entry_time).total_seconds() / 60
-                    candles_held = idx
-                    # Max profit will be at least the target
-                    if max_profit_points < (target_price - entry_price):
-                        max_profit_points = target_price - entry_price
-                        max_profit_percent = target_percent
-                    break
-                
-                # Check if stop loss hit
-                if low_price <= stop_loss_price:
-                    exit_price = stop_loss_price
-                    exit_time = timestamp
-                    exit_reason = 'Stop loss triggered'
-                    outcome = 'stop_loss'
-                    minutes_held = (timestamp - entry_time).total_seconds() / 60
-                    candles_held = idx
-                    break
-                
-                # Check if market close (3:30 PM)
-                if timestamp.time() >= self.market_close:
-                    exit_price = close_price
-                    exit_time = timestamp
-                    exit_reason = 'End of day exit'
-                    outcome = 'eod_exit'
-                    minutes_held = (timestamp - entry_time).total_seconds() / 60
-                    candles_held = idx
-                    break
-            
-            # If loop completes without break, use last candle
-            if exit_time == entry_time and len(same_day_candles) > 0:
-                last_candle = same_day_candles.iloc[-1]
-                exit_price = float(last_candle['close'])
-                exit_time = same_day_candles.index[-1]
-                minutes_held = (exit_time - entry_time).total_seconds() / 60
-                candles_held = len(same_day_candles)
-            
-            # Calculate final returns
-            points_gained = exit_price - entry_price
-            percentage_return = (points_gained / entry_price) * 100
-            
-            # If max profit is still 0 (never went into profit), keep it as 0
-            if max_profit_points < 0:
-                max_profit_points = 0.0
-                max_profit_percent = 0.0
-            
-            return {
-                'stock': symbol,
-                'pattern_date': pattern_time.strftime('%Y-%m-%d'),
-                'pattern_time': pattern_time.strftime('%H:%M'),
-                'entry_price': round(entry_price, 2),
-                'target_price': round(target_price, 2),
-                'stop_loss_price': round(stop_loss_price, 2),
-                'exit_price': round(exit_price, 2),
-                'exit_time': exit_time.strftime('%Y-%m-%d %H:%M'),
-                'exit_reason': exit_reason,
-                'points_gained': round(points_gained, 2),
-                'percentage_return': round(percentage_return, 2),
-                'minutes_held': int(minutes_held),
-                'candles_held': candles_held,
-                'outcome': outcome,
-                
-                # NEW FIELDS
-                'max_profit_points': round(max_profit_points, 2),
-                'max_profit_percent': round(max_profit_percent, 2),
-                'max_loss_points': round(max_loss_points, 2),
-                
-                # Additional pattern info
-                'lower_shadow': pattern.get('lower_shadow', 0),
-                'upper_shadow': pattern.get('upper_shadow', 0),
-                'body_size': pattern.get('body_size', 0),
-                'confidence': pattern.get('confidence', 0)
-            }
-            
-        except Exception as e:
-            logger.error(f"Error simulating trade: {e}")
-            return None
-    
-    def _empty_result(self, strategy: str) -> Dict:
-        """Return empty result structure"""
-        return {
-            'total_patterns': 0,
-            'target_hit_count': 0,
-            'stop_loss_count': 0,
-            'eod_exit_count': 0,
-            'target_hit_rate': 0.0,
-            'stop_loss_rate': 0.0,
-            'avg_return': 0.0,
-            'total_points_gained': 0.0,
-            'trades': [],
-            'message': f'No {strategy} patterns found in the selected period'
-        }
\ No newline at end of file
+import asyncio
+import os
+import numpy as np
+import pandas as pd
+import logging
+from collections import Counter
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, time
+from typing import List, Dict
+from backend.utils.pattern_detector import Pattern, PatternDetector
+from backend.config import Config
+
+logger = logging.getLogger(__name__)
+
+class BacktestEngine:
+    """Backtesting engine for candlestick patterns"""
+
+    # Worker threads for per-stock processing (NumPy releases the GIL)
+    MAX_WORKERS = 8
+
+    def __init__(self):
+        self.pattern_detector = PatternDetector()
+        self.market_open = time(9, 15)
+        self.market_close = time(15, 30)
+
+    def _make_executor(self) -> Executor:
+        """
+        Executor for per-stock work. Threads are the default: the numeric
+        kernels release the GIL and stocks arrive as in-process DataFrames.
+        BACKTEST_EXECUTOR=process switches to a process pool for large
+        CPU-bound universes where true core parallelism beats pickling cost.
+        """
+        if Config.BACKTEST_EXECUTOR == 'process':
+            return ProcessPoolExecutor(max_workers=os.cpu_count())
+        return ThreadPoolExecutor(max_workers=self.MAX_WORKERS)
+
+    async def run_backtest(
+        self,
+        historical_data: Dict[str, pd.DataFrame],
+        strategy: str,
+        target_percent: float,
+        stop_loss_percent: float
+    ) -> Dict:
+        """
+        Run backtest on historical data
+
+        Args:
+            historical_data: Dict of {symbol: DataFrame}
+            strategy: 'hammer' or 'inverted_hammer'
+            target_percent: Target profit percentage
+            stop_loss_percent: Stop loss percentage
+
+        Returns:
+            Dict with backtest results
+        """
+        logger.info(f"Starting {strategy} backtest for {len(historical_data)} stocks")
+
+        # Process stocks concurrently: each worker detects and simulates one
+        # stock independently and returns its own trade list, merged here.
+        loop = asyncio.get_running_loop()
+        with self._make_executor() as pool:
+            tasks = [
+                loop.run_in_executor(
+                    pool,
+                    self._process_stock,
+                    symbol, df, strategy, target_percent, stop_loss_percent
+                )
+                for symbol, df in historical_data.items()
+            ]
+            stock_trades = await asyncio.gather(*tasks, return_exceptions=True)
+
+        all_trades = []
+        for symbol, trades in zip(historical_data, stock_trades):
+            if isinstance(trades, Exception):
+                logger.error(f"Error processing {symbol}: {trades}")
+                continue
+            all_trades.extend(trades)
+
+        # Aggregate outcomes in one counting pass — no per-trade branching
+        outcome_counts = Counter(t['outcome'] for t in all_trades)
+        total_target_hits = outcome_counts['target_hit']
+        total_stop_losses = outcome_counts['stop_loss']
+        total_eod_exits = len(all_trades) - total_target_hits - total_stop_losses
+        total_points = sum(t['points_gained'] for t in all_trades)
+
+        # Restore chronological order across stocks (gather returns trades
+        # grouped per stock). Sort via a datetime64 key vector + argsort —
+        # C-level int64 comparisons instead of a per-comparison Python key.
+        if all_trades:
+            trade_times = np.array(
+                [f"{t['pattern_date']}T{t['pattern_time']}" for t in all_trades],
+                dtype='datetime64[m]'
+            )
+            order = np.argsort(trade_times, kind='stable')
+            all_trades = [all_trades[i] for i in order]
+
+        # Calculate summary statistics
+        total_patterns = len(all_trades)
+
+        if total_patterns == 0:
+            return self._empty_result(strategy)
+
+        target_hit_rate = (total_target_hits / total_patterns) * 100
+        stop_loss_rate = (total_stop_losses / total_patterns) * 100
+        avg_return = sum(t['percentage_return'] for t in all_trades) / total_patterns
+
+        logger.info(f"✅ Backtest completed: {total_patterns} trades analyzed")
+
+        return {
+            'total_patterns': total_patterns,
+            'target_hit_count': total_target_hits,
+            'stop_loss_count': total_stop_losses,
+            'eod_exit_count': total_eod_exits,
+            'target_hit_rate': round(target_hit_rate, 2),
+            'stop_loss_rate': round(stop_loss_rate, 2),
+            'avg_return': round(avg_return, 2),
+            'total_points_gained': round(total_points, 2),
+            'trades': all_trades
+        }
+
+    def _process_stock(
+        self,
+        symbol: str,
+        df: pd.DataFrame,
+        strategy: str,
+        target_percent: float,
+        stop_loss_percent: float
+    ) -> List[Dict]:
+        """
+        Detect patterns and simulate trades for a single stock.
+        Runs in a worker thread — must not touch shared mutable state.
+        """
+        logger.debug("Analyzing %s...", symbol)
+
+        df = self._filter_trading_sessions(df)
+        if df.empty:
+            logger.debug("No session candles for %s", symbol)
+            return []
+
+        # Detect patterns
+        if strategy == 'hammer':
+            patterns = self.pattern_detector.detect_hammer(df)
+        elif strategy == 'inverted_hammer':
+            patterns = self.pattern_detector.detect_inverted_hammer(df)
+        else:
+            logger.error(f"Unknown strategy: {strategy}")
+            return []
+
+        if not patterns:
+            logger.debug("No %s patterns found for %s", strategy, symbol)
+            return []
+
+        logger.debug("Found %d %s patterns in %s", len(patterns), strategy, symbol)
+
+        return self._simulate_trades(
+            symbol=symbol,
+            patterns=patterns,
+            df=df,
+            target_percent=target_percent,
+            stop_loss_percent=stop_loss_percent
+        )
+
+    def _filter_trading_sessions(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Keep only weekday candles inside the 09:15-15:30 session.
+
+        Pure DatetimeIndex ops — a between-time indexer plus a dayofweek
+        mask — so no per-timestamp Python calls are involved.
+        """
+        idx = df.index
+        mask = np.zeros(len(df), dtype=bool)
+        mask[idx.indexer_between_time(self.market_open, self.market_close)] = True
+        mask &= idx.dayofweek.to_numpy() < 5
+        if mask.all():
+            return df
+        return df[mask]
+
+    def _simulate_trades(
+        self,
+        symbol: str,
+        patterns: List[Pattern],
+        df: pd.DataFrame,
+        target_percent: float,
+        stop_loss_percent: float
+    ) -> List[Dict]:
+        """
+        Simulate trades for all patterns of a stock in one batched pass.
+
+        Target and stop prices are computed as arrays for every pattern up
+        front, then each pattern's exit is resolved with vectorized
+        first-hit scans against the stock's high/low arrays instead of a
+        per-candle Python loop.
+
+        Returns:
+            List of trade dicts including max_profit_reached fields
+        """
+        index = df.index
+
+        # Work on naive wall-clock timestamps so day/session arithmetic
+        # matches exchange local time
+        naive = index.tz_localize(None) if index.tz is not None else index
+        ts = naive.values
+        highs = df['high'].to_numpy()
+        lows = df['low'].to_numpy()
+        closes = df['close'].to_numpy()
+
+        # Day id and session-close mask, built once per stock and sliced per
+        # pattern — no per-candle time-of-day objects anywhere
+        days = ts.astype('datetime64[D]')
+        secs = (ts - days).astype('timedelta64[s]').astype(np.int64)
+        close_secs = self.market_close.hour * 3600 + self.market_close.minute * 60
+        past_close = secs >= close_secs
+
+        # Batch target/stop prices across all patterns of the stock
+        entries = np.array([p.entry_price for p in patterns], dtype=np.float64)
+        targets = entries * (1 + target_percent / 100)
+        stops = entries * (1 - stop_loss_percent / 100)
+
+        # Resolve every pattern's same-day candle window (strictly after
+        # entry, up to end of the entry day) with two searchsorted calls
+        entry_times64 = np.array([
+            (t.tz_localize(None) if t.tzinfo else t).to_datetime64()
+            for t in (p.entry_timestamp for p in patterns)
+        ], dtype='datetime64[ns]')
+        starts = np.searchsorted(ts, entry_times64, side='right')
+        ends = np.searchsorted(days, entry_times64.astype('datetime64[D]'), side='right')
+
+        # Per-trade results accumulate as parallel columns (SoA); the dicts
+        # are only materialized once at the end of the pass
+        kept = []
+        exit_prices = []
+        exit_times = []
+        exit_reasons = []
+        outcomes = []
+        minutes_list = []
+        candles_list = []
+        max_profits = []
+        max_losses = []
+
+        for k, pattern in enumerate(patterns):
+            try:
+                entry_time = pattern.entry_timestamp
+                # entries/targets/stops are float64 arrays — their scalars
+                # are already Python-float compatible, no coercion needed
+                entry_price = entries[k]
+                target_price = targets[k]
+                stop_loss_price = stops[k]
+
+                start = int(starts[k])
+                end = int(ends[k])
+                if start >= end:
+                    continue
+
+                n = end - start
+                window_highs = highs[start:end]
+                window_lows = lows[start:end]
+
+                # First candle hitting each exit condition (n = never)
+                hit_target = window_highs >= target_price
+                hit_stop = window_lows <= stop_loss_price
+                hit_close = past_close[start:end]
+
+                j_target = int(hit_target.argmax()) if hit_target.any() else n
+                j_stop = int(hit_stop.argmax()) if hit_stop.any() else n
+                j_close = int(hit_close.argmax()) if hit_close.any() else n
+                j = min(j_target, j_stop, j_close)
+
+                if j < n:
+                    exit_idx = start + j
+                    exit_time = index[exit_idx]
+                    candles_held = j + 1
+
+                    # Target has priority within a candle, then stop loss
+                    if j == j_target:
+                        exit_price = target_price
+                        exit_reason = 'Target hit'
+                        outcome = 'target_hit'
+                    elif j == j_stop:
+                        exit_price = stop_loss_price
+                        exit_reason = 'Stop loss triggered'
+                        outcome = 'stop_loss'
+                    else:
+                        exit_price = float(closes[exit_idx])
+                        exit_reason = 'End of day exit'
+                        outcome = 'eod_exit'
+                else:
+                    # No exit condition inside the session — close out on the
+                    # last candle of the day
+                    exit_idx = end - 1
+                    exit_time = index[exit_idx]
+                    exit_price = float(closes[exit_idx])
+                    exit_reason = 'eod_exit'
+                    outcome = 'eod_exit'
+                    candles_held = n
+
+                minutes_held = (exit_time - entry_time).total_seconds() / 60
+
+                # Max profit/loss over the candles seen up to and including exit
+                max_profit_points = max(float(window_highs[:candles_held].max()) - entry_price, 0.0)
+                max_loss_points = max(entry_price - float(window_lows[:candles_held].min()), 0.0)
+
+                # Max profit will be at least the target when the target was hit
+                if outcome == 'target_hit' and max_profit_points < (target_price - entry_price):
+                    max_profit_points = target_price - entry_price
+
+                kept.append(k)
+                exit_prices.append(exit_price)
+                exit_times.append(exit_time)
+                exit_reasons.append(exit_reason)
+                outcomes.append(outcome)
+                minutes_list.append(minutes_held)
+                candles_list.append(candles_held)
+                max_profits.append(max_profit_points)
+                max_losses.append(max_loss_points)
+
+            except Exception as e:
+                logger.error(f"Error simulating trade: {e}")
+                continue
+
+        if not kept:
+            return []
+
+        # Derived columns and rounding happen vectorized, once per stock;
+        # .tolist() hands back native Python floats for serialization
+        kept_idx = np.asarray(kept, dtype=np.intp)
+        entry_arr = entries[kept_idx]
+        exit_arr = np.asarray(exit_prices)
+        points_arr = exit_arr - entry_arr
+        pct_arr = (points_arr / entry_arr) * 100
+        mp_arr = np.asarray(max_profits)
+        mpp_arr = np.where(mp_arr > 0, (mp_arr / entry_arr) * 100, 0.0)
+
+        # Format all timestamps in three vectorized strftime calls instead
+        # of three scalar strftimes per trade
+        pattern_ts = pd.DatetimeIndex([patterns[k].timestamp for k in kept])
+        pattern_dates = pattern_ts.strftime('%Y-%m-%d').tolist()
+        pattern_clock = pattern_ts.strftime('%H:%M').tolist()
+        exit_strs = pd.DatetimeIndex(exit_times).strftime('%Y-%m-%d %H:%M').tolist()
+
+        cols = {
+            'entry_price': np.round(entry_arr, 2).tolist(),
+            'target_price': np.round(targets[kept_idx], 2).tolist(),
+            'stop_loss_price': np.round(stops[kept_idx], 2).tolist(),
+            'exit_price': np.round(exit_arr, 2).tolist(),
+            'points_gained': np.round(points_arr, 2).tolist(),
+            'percentage_return': np.round(pct_arr, 2).tolist(),
+            'minutes_held': np.asarray(minutes_list).astype(np.int64).tolist(),
+            'max_profit_points': np.round(mp_arr, 2).tolist(),
+            'max_profit_percent': np.round(mpp_arr, 2).tolist(),
+            'max_loss_points': np.round(np.asarray(max_losses), 2).tolist(),
+        }
+
+        return [
+            {
+                'stock': symbol,
+                'pattern_date': pattern_dates[row],
+                'pattern_time': pattern_clock[row],
+                'entry_price': cols['entry_price'][row],
+                'target_price': cols['target_price'][row],
+                'stop_loss_price': cols['stop_loss_price'][row],
+                'exit_price': cols['exit_price'][row],
+                'exit_time': exit_strs[row],
+                'exit_reason': exit_reasons[row],
+                'points_gained': cols['points_gained'][row],
+                'percentage_return': cols['percentage_return'][row],
+                'minutes_held': cols['minutes_held'][row],
+                'candles_held': candles_list[row],
+                'outcome': outcomes[row],
+
+                # Max profit tracking
+                'max_profit_points': cols['max_profit_points'][row],
+                'max_profit_percent': cols['max_profit_percent'][row],
+                'max_loss_points': cols['max_loss_points'][row],
+
+                # Additional pattern info
+                'lower_shadow': patterns[k].lower_shadow,
+                'upper_shadow': patterns[k].upper_shadow,
+                'body_size': patterns[k].body_size,
+                'confidence': patterns[k].confidence
+            }
+            for row, k in enumerate(kept)
+        ]
+
+    def _empty_result(self, strategy: str) -> Dict:
+        """Return empty result structure"""
+        return {
+            'total_patterns': 0,
+            'target_hit_count': 0,
+            'stop_loss_count': 0,
+            'eod_exit_count': 0,
+            'target_hit_rate': 0.0,
+            'stop_loss_rate': 0.0,
+            'avg_return': 0.0,
+            'total_points_gained': 0.0,
+            'trades': [],
+            'message': f'No {strategy} patterns found in the selected period'
+        }
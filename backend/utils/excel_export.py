@@ -1,161 +1,165 @@
-import pandas as pd
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils.dataframe import dataframe_to_rows
-from io import BytesIO
-import logging
-
-logger = logging.getLogger(__name__)
-
-class ExcelExporter:
-    """Generate Excel files from backtest results"""
-    
-    @staticmethod
-    def create_excel_report(trades_data: list, summary_data: dict) -> BytesIO:
-        """
-        Create comprehensive Excel report with multiple sheets
-        Returns BytesIO object ready for download
-        """
-        try:
-            # Create Excel workbook
-            wb = Workbook()
-            
-            # Remove default sheet
-            wb.remove(wb.active)
-            
-            # Create Summary sheet
-            ExcelExporter._create_summary_sheet(wb, summary_data)
-            
-            # Create Trades sheet
-            ExcelExporter._create_trades_sheet(wb, trades_data)
-            
-            # Save to BytesIO
-            excel_file = BytesIO()
-            wb.save(excel_file)
-            excel_file.seek(0)
-            
-            return excel_file
-            
-        except Exception as e:
-            logger.error(f"Error creating Excel report: {e}")
-            raise
-    
-    @staticmethod
-    def _create_summary_sheet(wb: Workbook, summary: dict):
-        """Create summary sheet with key metrics"""
-        ws = wb.create_sheet("Summary", 0)
-        
-        # Header styling
-        header_fill = PatternFill(start_color="FF6B6B", end_color="FF6B6B", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF", size=12)
-        
-        # Title
-        ws['A1'] = "Backtest Summary Report"
-        ws['A1'].font = Font(bold=True, size=16, color="FF6B6B")
-        ws.merge_cells('A1:B1')
-        
-        # Metrics
-        metrics = [
-            ('', ''),
-            ('Strategy', summary.get('strategy', 'N/A')),
-            ('Period', summary.get('period', 'N/A')),
-            ('Stocks Analyzed', summary.get('stocks_analyzed', 0)),
-            ('', ''),
-            ('Total Patterns Found', summary.get('total_patterns', 0)),
-            ('Target Hit', summary.get('target_hit_count', 0)),
-            ('Stop Loss Hit', summary.get('stop_loss_count', 0)),
-            ('End of Day Exits', summary.get('eod_exit_count', 0)),
-            ('', ''),
-            ('Target Hit Rate', f"{summary.get('target_hit_rate', 0):.2f}%"),
-            ('Stop Loss Rate', f"{summary.get('stop_loss_rate', 0):.2f}%"),
-            ('Average Return', f"{summary.get('avg_return', 0):.2f}%"),
-            ('Total Points Gained', f"₹{summary.get('total_points_gained', 0):.2f}"),
-        ]
-        
-        row = 3
-        for label, value in metrics:
-            if label:  # Skip empty rows
-                ws[f'A{row}'] = label
-                ws[f'B{row}'] = value
-                ws[f'A{row}'].font = Font(bold=True)
-            row += 1
-        
-        # Adjust column widths
-        ws.column_dimensions['A'].width = 25
-        ws.column_dimensions['B'].width = 30
-    
-    @staticmethod
-    def _create_trades_sheet(wb: Workbook, trades: list):
-        """Create detailed trades sheet with max profit columns"""
-        ws = wb.create_sheet("Detailed Trades", 1)
-        
-        # Headers - UPDATED with Max Profit columns
-        headers = [
-            'Stock Symbol', 'Pattern Date', 'Pattern Time', 'Entry Price',
-            'Target Price', 'Stop Loss Price', 'Exit Price', 'Exit Time',
-            'Exit Reason', 'Max Profit ₹', 'Max Profit %', 'Points Gained', 
-            'Percentage Return', 'Minutes Held', 'Candles Held', 'Outcome'
-        ]
-        
-        # Style for headers
-        header_fill = PatternFill(start_color="4A90E2", end_color="4A90E2", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
-        border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        
-        # Write headers
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.border = border
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-        
-        # Write trade data
-        for row_idx, trade in enumerate(trades, 2):
-            ws.cell(row=row_idx, column=1, value=trade.get('stock', ''))
-            ws.cell(row=row_idx, column=2, value=trade.get('pattern_date', ''))
-            ws.cell(row=row_idx, column=3, value=trade.get('pattern_time', ''))
-            ws.cell(row=row_idx, column=4, value=trade.get('entry_price', 0))
-            ws.cell(row=row_idx, column=5, value=trade.get('target_price', 0))
-            ws.cell(row=row_idx, column=6, value=trade.get('stop_loss_price', 0))
-            ws.cell(row=row_idx, column=7, value=trade.get('exit_price', 0))
-            ws.cell(row=row_idx, column=8, value=trade.get('exit_time', ''))
-            ws.cell(row=row_idx, column=9, value=trade.get('exit_reason', ''))
-            
-            # NEW: Max Profit columns
-            ws.cell(row=row_idx, column=10, value=trade.get('max_profit_points', 0))
-            ws.cell(row=row_idx, column=11, value=trade.get('max_profit_percent', 0))
-            
-            ws.cell(row=row_idx, column=12, value=trade.get('points_gained', 0))
-            ws.cell(row=row_idx, column=13, value=trade.get('percentage_return', 0))
-            ws.cell(row=row_idx, column=14, value=trade.get('minutes_held', 0))
-            ws.cell(row=row_idx, column=15, value=trade.get('candles_held', 0))
-            ws.cell(row=row_idx, column=16, value=trade.get('outcome', ''))
-            
-            # Color code max profit (green if positive)
-            max_profit_cell = ws.cell(row=row_idx, column=10)
-            if trade.get('max_profit_points', 0) > 0:
-                max_profit_cell.fill = PatternFill(start_color="E8F5E9", end_color="E8F5E9", fill_type="solid")
-                max_profit_cell.font = Font(color="2E7D32", bold=True)
-            
-            # Color code outcomes
-            outcome_cell = ws.cell(row=row_idx, column=16)
-            outcome = trade.get('outcome', '')
-            if outcome == 'target_hit':
-                outcome_cell.fill = PatternFill(start_color="51CF66", end_color="51CF66", fill_type="solid")
-            elif outcome == 'stop_loss':
-                outcome_cell.fill = PatternFill(start_color="FF6B6B", end_color="FF6B6B", fill_type="solid")
-            else:
-                outcome_cell.fill = PatternFill(start_color="FFD43B", end_color="FFD43B", fill_type="solid")
-        
-        # Adjust column widths
-        for col in range(1, len(headers) + 1):
-            ws.column_dimensions[chr(64 + col)].width = 15
-        
-        # Freeze first row
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.dataframe import dataframe_to_rows
+from io import BytesIO
+import logging
+
+logger = logging.getLogger(__name__)
+
+# openpyxl style objects are immutable and hashable — build each exactly
+# once at import instead of re-constructing them per cell in the row loop
+_HEADER_FILL = PatternFill(start_color="4A90E2", end_color="4A90E2", fill_type="solid")
+_HEADER_FONT = Font(bold=True, color="FFFFFF")
+_HEADER_BORDER = Border(
+    left=Side(style='thin'),
+    right=Side(style='thin'),
+    top=Side(style='thin'),
+    bottom=Side(style='thin')
+)
+_HEADER_ALIGNMENT = Alignment(horizontal='center', vertical='center')
+
+_TITLE_FONT = Font(bold=True, size=16, color="FF6B6B")
+_BOLD_FONT = Font(bold=True)
+
+_MAX_PROFIT_FILL = PatternFill(start_color="E8F5E9", end_color="E8F5E9", fill_type="solid")
+_MAX_PROFIT_FONT = Font(color="2E7D32", bold=True)
+
+_FILL_GREEN = PatternFill(start_color="51CF66", end_color="51CF66", fill_type="solid")
+_FILL_RED = PatternFill(start_color="FF6B6B", end_color="FF6B6B", fill_type="solid")
+_FILL_YELLOW = PatternFill(start_color="FFD43B", end_color="FFD43B", fill_type="solid")
+_OUTCOME_FILLS = {'target_hit': _FILL_GREEN, 'stop_loss': _FILL_RED}
+
+# Trade-dict fields in sheet column order, with per-field defaults — each
+# row is pulled from the dict once instead of one .get per cell write
+_TRADE_FIELDS = (
+    ('stock', ''), ('pattern_date', ''), ('pattern_time', ''),
+    ('entry_price', 0), ('target_price', 0), ('stop_loss_price', 0),
+    ('exit_price', 0), ('exit_time', ''), ('exit_reason', ''),
+    ('max_profit_points', 0), ('max_profit_percent', 0),
+    ('points_gained', 0), ('percentage_return', 0),
+    ('minutes_held', 0), ('candles_held', 0), ('outcome', '')
+)
+
+
+class ExcelExporter:
+    """Generate Excel files from backtest results"""
+    
+    @staticmethod
+    def create_excel_report(trades_data: list, summary_data: dict) -> BytesIO:
+        """
+        Create comprehensive Excel report with multiple sheets
+        Returns BytesIO object ready for download
+        """
+        try:
+            # Create Excel workbook
+            wb = Workbook()
+            
+            # Remove default sheet
+            wb.remove(wb.active)
+            
+            # Create Summary sheet
+            ExcelExporter._create_summary_sheet(wb, summary_data)
+            
+            # Create Trades sheet
+            ExcelExporter._create_trades_sheet(wb, trades_data)
+            
+            # Save to BytesIO
+            excel_file = BytesIO()
+            wb.save(excel_file)
+            excel_file.seek(0)
+            
+            return excel_file
+            
+        except Exception as e:
+            logger.error(f"Error creating Excel report: {e}")
+            raise
+    
+    @staticmethod
+    def _create_summary_sheet(wb: Workbook, summary: dict):
+        """Create summary sheet with key metrics"""
+        ws = wb.create_sheet("Summary", 0)
+        
+        # Title
+        ws['A1'] = "Backtest Summary Report"
+        ws['A1'].font = _TITLE_FONT
+        ws.merge_cells('A1:B1')
+        
+        # Metrics
+        metrics = [
+            ('', ''),
+            ('Strategy', summary.get('strategy', 'N/A')),
+            ('Period', summary.get('period', 'N/A')),
+            ('Stocks Analyzed', summary.get('stocks_analyzed', 0)),
+            ('', ''),
+            ('Total Patterns Found', summary.get('total_patterns', 0)),
+            ('Target Hit', summary.get('target_hit_count', 0)),
+            ('Stop Loss Hit', summary.get('stop_loss_count', 0)),
+            ('End of Day Exits', summary.get('eod_exit_count', 0)),
+            ('', ''),
+            ('Target Hit Rate', f"{summary.get('target_hit_rate', 0):.2f}%"),
+            ('Stop Loss Rate', f"{summary.get('stop_loss_rate', 0):.2f}%"),
+            ('Average Return', f"{summary.get('avg_return', 0):.2f}%"),
+            ('Total Points Gained', f"₹{summary.get('total_points_gained', 0):.2f}"),
+        ]
+        
+        # Append rows in order instead of addressing cells by coordinate
+        # string — no 'A{row}' formatting/parsing per write
+        ws.append(())  # Blank row under the title
+        for label, value in metrics:
+            if label:
+                ws.append((label, value))
+                ws.cell(row=ws.max_row, column=1).font = _BOLD_FONT
+            else:
+                ws.append(())  # Preserve spacer rows
+        
+        # Adjust column widths
+        ws.column_dimensions['A'].width = 25
+        ws.column_dimensions['B'].width = 30
+    
+    @staticmethod
+    def _create_trades_sheet(wb: Workbook, trades: list):
+        """Create detailed trades sheet with max profit columns"""
+        ws = wb.create_sheet("Detailed Trades", 1)
+        
+        # Headers - UPDATED with Max Profit columns
+        headers = [
+            'Stock Symbol', 'Pattern Date', 'Pattern Time', 'Entry Price',
+            'Target Price', 'Stop Loss Price', 'Exit Price', 'Exit Time',
+            'Exit Reason', 'Max Profit ₹', 'Max Profit %', 'Points Gained', 
+            'Percentage Return', 'Minutes Held', 'Candles Held', 'Outcome'
+        ]
+        
+        # Write headers (styles are module-level constants)
+        for col, header in enumerate(headers, 1):
+            cell = ws.cell(row=1, column=col, value=header)
+            cell.fill = _HEADER_FILL
+            cell.font = _HEADER_FONT
+            cell.border = _HEADER_BORDER
+            cell.alignment = _HEADER_ALIGNMENT
+        
+        # Write trade data: unpack each dict to a row tuple once, then one
+        # cell write per column
+        for row_idx, trade in enumerate(trades, 2):
+            row = tuple(trade.get(field, default) for field, default in _TRADE_FIELDS)
+            for col, value in enumerate(row, 1):
+                ws.cell(row=row_idx, column=col, value=value)
+            
+            # Color code max profit (green if positive)
+            if row[9] > 0:
+                max_profit_cell = ws.cell(row=row_idx, column=10)
+                max_profit_cell.fill = _MAX_PROFIT_FILL
+                max_profit_cell.font = _MAX_PROFIT_FONT
+            
+            # Color code outcomes — one dict lookup instead of an object
+            # allocation per row
+            outcome_cell = ws.cell(row=row_idx, column=16)
+            outcome_cell.fill = _OUTCOME_FILLS.get(row[15], _FILL_YELLOW)
+        
+        # Adjust column widths (chr(64 + col) breaks past column Z)
+        for col in range(1, len(headers) + 1):
+            ws.column_dimensions[get_column_letter(col)].width = 15
+        
+        # Freeze first row
         ws.freeze_panes = 'A2'
\ No newline at end of file
@@ -1,289 +1,275 @@
-import pandas as pd
-import numpy as np
-import logging
-from typing import List, Dict, Tuple
-from backend.config import Config
-
-
-logger = logging.getLogger(__name__)
-
-class PatternDetector:
-    """Detects candlestick patterns in OHLC data"""
-    
-    @staticmethod
-    def detect_hammer(df: pd.DataFrame) -> List[Dict]:
-        """
-        Detect Hammer pattern with SIZE validation:
-        - Lower shadow significantly longer than upper shadow
-        - Lower shadow at least 1.5x body size
-        - Candle must be significant size (not tiny)
-        - Filters based on average candle size
-        """
-        patterns = []
-        
-        # Calculate average candle metrics for filtering
-        df_copy = df.copy()
-        df_copy['range'] = df_copy['high'] - df_copy['low']
-        df_copy['body'] = abs(df_copy['close'] - df_copy['open'])
-        
-        # Get average range and body over lookback period
-        avg_range = df_copy['range'].rolling(window=20, min_periods=5).mean()
-        avg_body = df_copy['body'].rolling(window=20, min_periods=5).mean()
-        
-        # Need at least 1 candle after for entry price
-        for i in range(len(df) - 1):
-            try:
-                candle = df.iloc[i]
-                timestamp = df.index[i]
-                
-                open_price = float(candle['open'])
-                high_price = float(candle['high'])
-                low_price = float(candle['low'])
-                close_price = float(candle['close'])
-                
-                # Calculate body and shadows
-                body = abs(close_price - open_price)
-                total_range = high_price - low_price
-                
-                # Skip if no range
-                if total_range == 0 or total_range < 0.01:
-                    continue
-                
-                lower_shadow = min(open_price, close_price) - low_price
-                upper_shadow = high_price - max(open_price, close_price)
-                
-                # Doji check - skip
-                if body == 0:
-                    continue
-                
-                # SIZE VALIDATION - Critical for filtering small candles
-                # 1. Minimum absolute size requirements
-                if total_range < 2.0:  # Candle range must be at least 2 rupees
-                    continue
-                
-                if lower_shadow < 1.0:  # Lower shadow must be at least 1 rupee
-                    continue
-                
-                if body < 0.3:  # Body must be at least 0.3 rupees
-                    continue
-                
-                # 2. Relative size validation (compared to recent average)
-                if i >= 5:  # Need some history
-                    current_avg_range = avg_range.iloc[i]
-                    current_avg_body = avg_body.iloc[i]
-                    
-                    if pd.notna(current_avg_range) and current_avg_range > 0:
-                        # Range should be at least 50% of average range
-                        if total_range < (current_avg_range * 0.5):
-                            continue
-                    
-                    if pd.notna(current_avg_body) and current_avg_body > 0:
-                        # Body should be at least 30% of average body
-                        if body < (current_avg_body * 0.3):
-                            continue
-                
-                # Calculate ratios
-                lower_shadow_ratio = lower_shadow / body
-                upper_shadow_ratio = upper_shadow / body
-                body_ratio = body / total_range
-                
-                # Hammer criteria (same as before)
-                is_hammer = (
-                    lower_shadow > upper_shadow and  # Lower shadow dominant
-                    lower_shadow_ratio >= 1.5 and     # Lower shadow >= 1.5x body
-                    upper_shadow_ratio <= 1.0 and     # Upper shadow <= body
-                    body_ratio >= 0.05 and            # Body >= 5% of range
-                    lower_shadow >= 1.5               # Absolute minimum shadow (1.5 points)
-                )
-                
-                if is_hammer:
-                    # Get NEXT candle for entry price
-                    next_candle = df.iloc[i + 1]
-                    entry_price = float(next_candle['open'])
-                    
-                    # Additional: Skip if next candle gaps too much
-                    price_gap = abs(entry_price - close_price) / close_price
-                    if price_gap > 0.03:  # Skip if gap > 3%
-                        continue
-                    
-                    patterns.append({
-                        'timestamp': timestamp,
-                        'entry_timestamp': df.index[i + 1],
-                        'open': open_price,
-                        'high': high_price,
-                        'low': low_price,
-                        'close': close_price,
-                        'entry_price': entry_price,
-                        'pattern_type': 'hammer',
-                        'lower_shadow': round(lower_shadow, 2),
-                        'upper_shadow': round(upper_shadow, 2),
-                        'body_size': round(body, 2),
-                        'total_range': round(total_range, 2),
-                        'lower_shadow_ratio': round(lower_shadow_ratio, 2),
-                        'upper_shadow_ratio': round(upper_shadow_ratio, 2),
-                        'avg_range': round(avg_range.iloc[i], 2) if i >= 5 and pd.notna(avg_range.iloc[i]) else 0,
-                        'confidence': PatternDetector._calculate_confidence(
-                            lower_shadow_ratio, upper_shadow_ratio, body_ratio, total_range
-                        )
-                    })
-                    
-            except Exception as e:
-                logger.debug(f"Error detecting pattern at index {i}: {e}")
-                continue
-        
-        logger.info(f"Detected {len(patterns)} hammer patterns (after size filtering)")
-        return patterns
-    
-    @staticmethod
-    def detect_inverted_hammer(df: pd.DataFrame) -> List[Dict]:
-        """
-        Detect Inverted Hammer pattern with SIZE validation
-        """
-        patterns = []
-        
-        # Calculate average metrics
-        df_copy = df.copy()
-        df_copy['range'] = df_copy['high'] - df_copy['low']
-        df_copy['body'] = abs(df_copy['close'] - df_copy['open'])
-        
-        avg_range = df_copy['range'].rolling(window=20, min_periods=5).mean()
-        avg_body = df_copy['body'].rolling(window=20, min_periods=5).mean()
-        
-        for i in range(len(df) - 1):
-            try:
-                candle = df.iloc[i]
-                timestamp = df.index[i]
-                
-                open_price = float(candle['open'])
-                high_price = float(candle['high'])
-                low_price = float(candle['low'])
-                close_price = float(candle['close'])
-                
-                body = abs(close_price - open_price)
-                total_range = high_price - low_price
-                
-                if total_range == 0 or total_range < 0.01:
-                    continue
-                
-                lower_shadow = min(open_price, close_price) - low_price
-                upper_shadow = high_price - max(open_price, close_price)
-                
-                if body == 0:
-                    continue
-                
-                # SIZE VALIDATION (same as hammer)
-                if total_range < 2.0:
-                    continue
-                
-                if upper_shadow < 1.0:  # Upper shadow minimum
-                    continue
-                
-                if body < 0.3:
-                    continue
-                
-                # Relative size validation
-                if i >= 5:
-                    current_avg_range = avg_range.iloc[i]
-                    current_avg_body = avg_body.iloc[i]
-                    
-                    if pd.notna(current_avg_range) and current_avg_range > 0:
-                        if total_range < (current_avg_range * 0.5):
-                            continue
-                    
-                    if pd.notna(current_avg_body) and current_avg_body > 0:
-                        if body < (current_avg_body * 0.3):
-                            continue
-                
-                upper_shadow_ratio = upper_shadow / body
-                lower_shadow_ratio = lower_shadow / body
-                body_ratio = body / total_range
-                
-                # Inverted hammer criteria
-                is_inverted_hammer = (
-                    upper_shadow > lower_shadow and
-                    upper_shadow_ratio >= 1.5 and
-                    lower_shadow_ratio <= 1.0 and
-                    body_ratio >= 0.05 and
-                    upper_shadow >= 1.5
-                )
-                
-                if is_inverted_hammer:
-                    next_candle = df.iloc[i + 1]
-                    entry_price = float(next_candle['open'])
-                    
-                    price_gap = abs(entry_price - close_price) / close_price
-                    if price_gap > 0.03:
-                        continue
-                    
-                    patterns.append({
-                        'timestamp': timestamp,
-                        'entry_timestamp': df.index[i + 1],
-                        'open': open_price,
-                        'high': high_price,
-                        'low': low_price,
-                        'close': close_price,
-                        'entry_price': entry_price,
-                        'pattern_type': 'inverted_hammer',
-                        'upper_shadow': round(upper_shadow, 2),
-                        'lower_shadow': round(lower_shadow, 2),
-                        'body_size': round(body, 2),
-                        'total_range': round(total_range, 2),
-                        'upper_shadow_ratio': round(upper_shadow_ratio, 2),
-                        'lower_shadow_ratio': round(lower_shadow_ratio, 2),
-                        'avg_range': round(avg_range.iloc[i], 2) if i >= 5 and pd.notna(avg_range.iloc[i]) else 0,
-                        'confidence': PatternDetector._calculate_confidence(
-                            upper_shadow_ratio, lower_shadow_ratio, body_ratio, total_range
-                        )
-                    })
-                    
-            except Exception as e:
-                logger.debug(f"Error detecting pattern at index {i}: {e}")
-                continue
-        
-        logger.info(f"Detected {len(patterns)} inverted hammer patterns (after size filtering)")
-        return patterns
-    
-    @staticmethod
-    def _calculate_confidence(shadow_ratio: float, opposite_shadow: float, 
-                            body_ratio: float, total_range: float) -> float:
-        """
-        Calculate pattern confidence score (0-100)
-        Now includes size factor
-        """
-        confidence = 40.0
-        
-        # Main shadow dominance
-        if shadow_ratio >= 3.0:
-            confidence += 30
-        elif shadow_ratio >= 2.5:
-            confidence += 25
-        elif shadow_ratio >= 2.0:
-            confidence += 20
-        elif shadow_ratio >= 1.5:
-            confidence += 15
-        
-        # Opposite shadow minimality
-        if opposite_shadow <= 0.3:
-            confidence += 15
-        elif opposite_shadow <= 0.5:
-            confidence += 12
-        elif opposite_shadow <= 0.7:
-            confidence += 8
-        elif opposite_shadow <= 1.0:
-            confidence += 5
-        
-        # Body significance
-        if body_ratio >= 0.15:
-            confidence += 10
-        elif body_ratio >= 0.10:
-            confidence += 7
-        elif body_ratio >= 0.05:
-            confidence += 3
-        
-        # Size bonus - larger candles get higher confidence
-        if total_range >= 5.0:
-            confidence += 5
-        elif total_range >= 3.0:
-            confidence += 3
-        
-        return min(confidence, 100.0)
\ No newline at end of file
+import pandas as pd
+import numpy as np
+import logging
+from dataclasses import dataclass
+from typing import List, Dict, Tuple
+from backend.config import Config
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class Pattern:
+    """
+    One detected candle pattern. Slots keep the per-pattern footprint small
+    and make field access a fixed offset instead of a dict lookup — with
+    thousands of patterns per run that beats a 16-key dict per candle.
+    """
+    timestamp: pd.Timestamp
+    entry_timestamp: pd.Timestamp
+    open: float
+    high: float
+    low: float
+    close: float
+    entry_price: float
+    pattern_type: str
+    lower_shadow: float
+    upper_shadow: float
+    body_size: float
+    total_range: float
+    lower_shadow_ratio: float
+    upper_shadow_ratio: float
+    avg_range: float
+    confidence: float
+
+
+class PatternDetector:
+    """Detects candlestick patterns in OHLC data"""
+
+    @staticmethod
+    def detect_hammer(df: pd.DataFrame) -> List[Pattern]:
+        """
+        Detect Hammer pattern with SIZE validation:
+        - Lower shadow significantly longer than upper shadow
+        - Lower shadow at least 1.5x body size
+        - Candle must be significant size (not tiny)
+        - Filters based on average candle size
+        """
+        return PatternDetector._detect_shadow_pattern(df, 'hammer')
+
+    @staticmethod
+    def detect_inverted_hammer(df: pd.DataFrame) -> List[Pattern]:
+        """
+        Detect Inverted Hammer pattern with SIZE validation
+        """
+        return PatternDetector._detect_shadow_pattern(df, 'inverted_hammer')
+
+    @staticmethod
+    def _detect_shadow_pattern(df: pd.DataFrame, pattern_type: str) -> List[Pattern]:
+        """
+        Shared scan for both shadow patterns. Hammer and inverted hammer are
+        mirror images — only which shadow must dominate differs — so one
+        parameterized pass covers both instead of two near-identical loops.
+        """
+        is_hammer = pattern_type == 'hammer'
+
+        # Need at least 1 candle after for entry price
+        if len(df) < 2:
+            return []
+
+        # Extract OHLC as contiguous arrays once; the whole scan runs as
+        # boolean masks over them — no per-candle Python loop
+        # Native dtype: float32 frames from the data layer stay float32 all
+        # the way through the mask evaluation
+        index = df.index
+        opens = df['open'].to_numpy()
+        highs = df['high'].to_numpy()
+        lows = df['low'].to_numpy()
+        closes = df['close'].to_numpy()
+
+        # Get average range and body over lookback period
+        ranges = highs - lows
+        bodies = np.abs(closes - opens)
+        avg_range = pd.Series(ranges).rolling(window=20, min_periods=5).mean().to_numpy()
+        avg_body = pd.Series(bodies).rolling(window=20, min_periods=5).mean().to_numpy()
+
+        lower_shadow = np.minimum(opens, closes) - lows
+        upper_shadow = highs - np.maximum(opens, closes)
+
+        # Dominant shadow: below the body for hammer, above for inverted
+        if is_hammer:
+            dominant_shadow, minor_shadow = lower_shadow, upper_shadow
+        else:
+            dominant_shadow, minor_shadow = upper_shadow, lower_shadow
+
+        # Degenerate rows (zero body/range) produce inf/nan ratios here and
+        # are excluded by the size mask below
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dominant_ratio = dominant_shadow / bodies
+            minor_ratio = minor_shadow / bodies
+            body_ratio = bodies / ranges
+
+        # Malformed rows (non-finite prices, high below the body, low above
+        # it) are excluded by one vectorized mask — no per-row try/except
+        valid = (
+            np.isfinite(opens) & np.isfinite(highs) &
+            np.isfinite(lows) & np.isfinite(closes) &
+            (lower_shadow >= 0) & (upper_shadow >= 0)
+        )
+        dropped = valid.size - int(valid.sum())
+        if dropped:
+            logger.warning("Skipping %d candles with inconsistent OHLC", dropped)
+
+        # SIZE VALIDATION - Critical for filtering small candles
+        # 1. Minimum absolute size requirements (also drops zero-range/doji rows)
+        mask = valid & (
+            (ranges >= 0.01) & (bodies > 0) &
+            (ranges >= 2.0) &        # Candle range must be at least 2 rupees
+            (dominant_shadow >= 1.0) &  # Dominant shadow must be at least 1 rupee
+            (bodies >= 0.3)          # Body must be at least 0.3 rupees
+        )
+
+        # 2. Relative size validation (compared to recent average, once
+        # enough history exists)
+        positions = np.arange(len(df))
+        has_avg_range = (positions >= 5) & ~np.isnan(avg_range) & (avg_range > 0)
+        has_avg_body = (positions >= 5) & ~np.isnan(avg_body) & (avg_body > 0)
+        mask &= ~(has_avg_range & (ranges < avg_range * 0.5))   # >= 50% of avg range
+        mask &= ~(has_avg_body & (bodies < avg_body * 0.3))     # >= 30% of avg body
+
+        # Pattern criteria (same thresholds for both orientations)
+        mask &= (
+            (dominant_shadow > minor_shadow) &  # Dominant shadow rules
+            (dominant_ratio >= 1.5) &           # Dominant shadow >= 1.5x body
+            (minor_ratio <= 1.0) &              # Minor shadow <= body
+            (body_ratio >= 0.05) &              # Body >= 5% of range
+            (dominant_shadow >= 1.5)            # Absolute minimum shadow (1.5 points)
+        )
+
+        # Skip if the next candle (the entry candle) gaps more than 3%
+        gap_ok = np.abs(opens[1:] - closes[:-1]) / closes[:-1] <= 0.03
+        mask = mask[:-1] & gap_ok
+
+        hits = np.flatnonzero(mask)
+
+        patterns = PatternDetector._build_patterns(
+            hits, pattern_type, index, opens, highs, lows, closes, avg_range
+        )
+
+        logger.debug(
+            "Detected %d %s patterns (after size filtering)",
+            len(patterns), pattern_type.replace('_', ' ')
+        )
+        return patterns
+
+    @staticmethod
+    def _build_patterns(
+        hits: np.ndarray,
+        pattern_type: str,
+        index: pd.DatetimeIndex,
+        opens: np.ndarray,
+        highs: np.ndarray,
+        lows: np.ndarray,
+        closes: np.ndarray,
+        avg_range: np.ndarray
+    ) -> List[Pattern]:
+        """
+        Materialize Pattern records for the surviving candle indices.
+
+        Everything is gathered and rounded as arrays first, so the hot loop
+        above allocates nothing per candle; records exist only for survivors.
+        """
+        if len(hits) == 0:
+            return []
+
+        idx = np.asarray(hits, dtype=np.intp)
+        # Upcast the survivor slices to float64: the scan runs in the frame's
+        # native float32 for bandwidth, but records feed the JSON response,
+        # where float32 rounding artifacts (1.2000000476...) would leak
+        o = opens[idx].astype(np.float64)
+        h = highs[idx].astype(np.float64)
+        l = lows[idx].astype(np.float64)
+        c = closes[idx].astype(np.float64)
+
+        body = np.abs(c - o)
+        total_range = h - l
+        lower_shadow = np.minimum(o, c) - l
+        upper_shadow = h - np.maximum(o, c)
+        lower_ratio = lower_shadow / body
+        upper_ratio = upper_shadow / body
+        body_ratio = body / total_range
+
+        if pattern_type == 'hammer':
+            dominant_ratio, minor_ratio = lower_ratio, upper_ratio
+        else:
+            dominant_ratio, minor_ratio = upper_ratio, lower_ratio
+
+        confidence = PatternDetector._calculate_confidence(
+            dominant_ratio, minor_ratio, body_ratio, total_range
+        )
+        avg_sel = avg_range[idx].astype(np.float64)
+        avg_r = np.where((idx >= 5) & ~np.isnan(avg_sel), np.round(avg_sel, 2), 0)
+
+        timestamps = index[idx]
+        entry_timestamps = index[idx + 1]
+        entry_prices = opens[idx + 1].astype(np.float64)
+
+        # tolist() converts NumPy scalars to Python floats: these fields are
+        # copied into the JSON API response, and np.float32 (unlike
+        # np.float64) does not subclass float, so json.dumps rejects it
+        return [
+            Pattern(
+                timestamp=ts,
+                entry_timestamp=entry_ts,
+                open=o_i,
+                high=h_i,
+                low=l_i,
+                close=c_i,
+                entry_price=entry_i,
+                pattern_type=pattern_type,
+                lower_shadow=ls_i,
+                upper_shadow=us_i,
+                body_size=b_i,
+                total_range=tr_i,
+                lower_shadow_ratio=lr_i,
+                upper_shadow_ratio=ur_i,
+                avg_range=ar_i,
+                confidence=conf_i
+            )
+            for ts, entry_ts, o_i, h_i, l_i, c_i, entry_i, ls_i, us_i, b_i, tr_i, lr_i, ur_i, ar_i, conf_i
+            in zip(
+                timestamps, entry_timestamps,
+                o.tolist(), h.tolist(), l.tolist(), c.tolist(),
+                entry_prices.tolist(),
+                np.round(lower_shadow, 2).tolist(), np.round(upper_shadow, 2).tolist(),
+                np.round(body, 2).tolist(), np.round(total_range, 2).tolist(),
+                np.round(lower_ratio, 2).tolist(), np.round(upper_ratio, 2).tolist(),
+                avg_r.tolist(), np.asarray(confidence).tolist()
+            )
+        ]
+
+    @staticmethod
+    def _calculate_confidence(shadow_ratio: float, opposite_shadow: float,
+                            body_ratio: float, total_range: float) -> float:
+        """
+        Calculate pattern confidence score (0-100)
+        Now includes size factor
+
+        Branchless form: each tier of the old if/elif ladders is expressed as
+        a boolean-weighted increment, so the same code works elementwise on
+        NumPy arrays as well as scalars.
+        """
+        # Main shadow dominance (15/20/25/30 at thresholds 1.5/2.0/2.5/3.0)
+        shadow_score = (
+            15 * (shadow_ratio >= 1.5) + 5 * (shadow_ratio >= 2.0) +
+            5 * (shadow_ratio >= 2.5) + 5 * (shadow_ratio >= 3.0)
+        )
+
+        # Opposite shadow minimality (5/8/12/15 at thresholds 1.0/0.7/0.5/0.3)
+        opposite_score = (
+            5 * (opposite_shadow <= 1.0) + 3 * (opposite_shadow <= 0.7) +
+            4 * (opposite_shadow <= 0.5) + 3 * (opposite_shadow <= 0.3)
+        )
+
+        # Body significance (3/7/10 at thresholds 0.05/0.10/0.15)
+        body_score = (
+            3 * (body_ratio >= 0.05) + 4 * (body_ratio >= 0.10) +
+            3 * (body_ratio >= 0.15)
+        )
+
+        # Size bonus - larger candles get higher confidence (3/5 at 3.0/5.0)
+        size_score = 3 * (total_range >= 3.0) + 2 * (total_range >= 5.0)
+
+        confidence = 40.0 + shadow_score + opposite_score + body_score + size_score
+        return np.minimum(confidence, 100.0)
@@ -1,21 +1,116 @@
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, PageBreak
+from reportlab.platypus import SimpleDocTemplate, Table, LongTable, TableStyle, Paragraph, Spacer, Image, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
+from collections import OrderedDict
 from io import BytesIO
 from datetime import datetime
+from operator import itemgetter
 from typing import Dict, List
+import hashlib
+import json
 import logging
 
 from backend.utils.chart_generator import ChartGenerator
 
 logger = logging.getLogger(__name__)
 
+# Outcome -> (background, text color) for the trade table. Built once at
+# import so the row loop does a dict lookup instead of re-parsing hex
+# strings and re-evaluating an if/elif chain per trade.
+_OUTCOME_STYLE = {
+    'target_hit': (colors.HexColor('#51CF66'), colors.white),
+    'stop_loss': (colors.HexColor('#FF6B6B'), colors.white),
+    'eod_exit': (colors.HexColor('#FFD43B'), colors.black),
+}
+
+# Fetches all trade-table fields in one C call per row
+_TRADE_ROW = itemgetter(
+    'stock', 'pattern_date', 'pattern_time', 'entry_price', 'target_price',
+    'stop_loss_price', 'exit_price', 'outcome', 'points_gained',
+    'percentage_return', 'max_profit_points'
+)
+
+# Document styles are identical for every report, so build them once at
+# import instead of per request. The style objects are read-only at
+# render time and safe to share across requests.
+_STYLES = getSampleStyleSheet()
+
+_TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=_STYLES['Heading1'],
+    fontSize=24,
+    textColor=colors.HexColor('#FF6B6B'),
+    alignment=TA_CENTER,
+    spaceAfter=30
+)
+
+_HEADING_STYLE = ParagraphStyle(
+    'CustomHeading',
+    parent=_STYLES['Heading2'],
+    fontSize=16,
+    textColor=colors.HexColor('#667EEA'),
+    spaceAfter=12
+)
+
+_SUBHEADING_STYLE = ParagraphStyle(
+    'CustomSubHeading',
+    parent=_STYLES['Heading3'],
+    fontSize=12,
+    textColor=colors.HexColor('#1A1A2E'),
+    spaceAfter=10
+)
+
+_SUMMARY_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#F0F0F0')),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+    ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+    ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ('TOPPADDING', (0, 0), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+])
+
+# Base commands for the trade table; copied per report because the
+# per-row outcome colors are appended to it
+_TRADE_TABLE_BASE_CMDS = [
+    # Header row
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#667EEA')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 8),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+
+    # Data rows
+    ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+    ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+    ('ALIGN', (0, 1), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 7),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F9F9F9')]),
+]
+
 class PDFReportGenerator:
     """Generate comprehensive PDF reports with charts and tables"""
-    
+
+    # Finished PDFs keyed by a digest of the inputs, LRU-evicted. Re-downloads
+    # of the same report skip chart rendering and document build entirely.
+    PDF_CACHE_MAX_ENTRIES = 8
+    _pdf_cache = OrderedDict()
+
+    @staticmethod
+    def _report_digest(results: Dict, summary_data: Dict) -> str:
+        """Stable content key for a report: hash of the canonicalized inputs"""
+        payload = json.dumps((summary_data, results), sort_keys=True, default=str)
+        return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
     @staticmethod
     def create_pdf_report(results: Dict, summary_data: Dict) -> BytesIO:
         """
@@ -32,6 +127,14 @@ class PDFReportGenerator:
             BytesIO object containing PDF
         """
         try:
+            cache = PDFReportGenerator._pdf_cache
+            cache_key = PDFReportGenerator._report_digest(results, summary_data)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                cache.move_to_end(cache_key)
+                logger.info("PDF cache hit — returning stored report")
+                return BytesIO(cached)
+
             logger.info("Creating PDF report...")
             
             # Create PDF buffer
@@ -50,45 +153,16 @@ class PDFReportGenerator:
             # Container for PDF elements
             story = []
             
-            # Define styles
-            styles = getSampleStyleSheet()
-            
-            # Custom styles
-            title_style = ParagraphStyle(
-                'CustomTitle',
-                parent=styles['Heading1'],
-                fontSize=24,
-                textColor=colors.HexColor('#FF6B6B'),
-                alignment=TA_CENTER,
-                spaceAfter=30
-            )
-            
-            heading_style = ParagraphStyle(
-                'CustomHeading',
-                parent=styles['Heading2'],
-                fontSize=16,
-                textColor=colors.HexColor('#667EEA'),
-                spaceAfter=12
-            )
-            
-            subheading_style = ParagraphStyle(
-                'CustomSubHeading',
-                parent=styles['Heading3'],
-                fontSize=12,
-                textColor=colors.HexColor('#1A1A2E'),
-                spaceAfter=10
-            )
-            
             # 1. TITLE PAGE
             story.append(Spacer(1, 1*inch))
-            story.append(Paragraph("🔨 SAGEFORGE", title_style))
-            story.append(Paragraph("Hammer Pattern Backtest Report", styles['Heading2']))
+            story.append(Paragraph("🔨 SAGEFORGE", _TITLE_STYLE))
+            story.append(Paragraph("Hammer Pattern Backtest Report", _STYLES['Heading2']))
             story.append(Spacer(1, 0.3*inch))
-            story.append(Paragraph(f"Generated: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}", styles['Normal']))
+            story.append(Paragraph(f"Generated: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}", _STYLES['Normal']))
             story.append(PageBreak())
             
             # 2. EXECUTIVE SUMMARY
-            story.append(Paragraph("EXECUTIVE SUMMARY", heading_style))
+            story.append(Paragraph("EXECUTIVE SUMMARY", _HEADING_STYLE))
             story.append(Spacer(1, 0.2*inch))
             
             # Summary table
@@ -108,24 +182,13 @@ class PDFReportGenerator:
             ]
             
             summary_table = Table(summary_items, colWidths=[3*inch, 3*inch])
-            summary_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#F0F0F0')),
-                ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-                ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-                ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-                ('TOPPADDING', (0, 0), (-1, -1), 8),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ]))
+            summary_table.setStyle(_SUMMARY_TABLE_STYLE)
             
             story.append(summary_table)
             story.append(PageBreak())
             
             # 3. PERFORMANCE CHARTS
-            story.append(Paragraph("PERFORMANCE ANALYSIS", heading_style))
+            story.append(Paragraph("PERFORMANCE ANALYSIS", _HEADING_STYLE))
             story.append(Spacer(1, 0.2*inch))
             
             # Generate all charts
@@ -142,7 +205,7 @@ class PDFReportGenerator:
             
             for chart_key, chart_buffer in charts.items():
                 # Add chart title
-                story.append(Paragraph(chart_titles[chart_key], subheading_style))
+                story.append(Paragraph(chart_titles[chart_key], _SUBHEADING_STYLE))
                 
                 # Add chart image
                 chart_buffer.seek(0)
@@ -157,7 +220,7 @@ class PDFReportGenerator:
             story.append(PageBreak())
             
             # 4. DETAILED TRADE TABLE
-            story.append(Paragraph("DETAILED TRADE RECORDS", heading_style))
+            story.append(Paragraph("DETAILED TRADE RECORDS", _HEADING_STYLE))
             story.append(Spacer(1, 0.2*inch))
             
             # Table headers
@@ -168,67 +231,55 @@ class PDFReportGenerator:
             
             # Add trade data
             for trade in results['trades']:
+                stock, date, time_, entry, target, stop, exit_, outcome, pts, pct, max_p = _TRADE_ROW(trade)
                 table_data.append([
-                    trade['stock'],
-                    trade['pattern_date'],
-                    trade['pattern_time'],
-                    f"₹{trade['entry_price']:.1f}",
-                    f"₹{trade['target_price']:.1f}",
-                    f"₹{trade['stop_loss_price']:.1f}",
-                    f"₹{trade['exit_price']:.1f}",
-                    PDFReportGenerator._format_outcome(trade['outcome']),
-                    f"{trade['points_gained']:+.1f}",
-                    f"{trade['percentage_return']:+.1f}%",
-                    f"₹{trade['max_profit_points']:.1f}"
+                    stock,
+                    date,
+                    time_,
+                    f"₹{entry:.1f}",
+                    f"₹{target:.1f}",
+                    f"₹{stop:.1f}",
+                    f"₹{exit_:.1f}",
+                    PDFReportGenerator._format_outcome(outcome),
+                    f"{pts:+.1f}",
+                    f"{pct:+.1f}%",
+                    f"₹{max_p:.1f}"
                 ])
             
-            # Create table
-            trade_table = Table(table_data, colWidths=[
+            # Create table — LongTable splits across pages row-major
+            # without re-running full layout per split, and repeats the
+            # header row on every page
+            trade_table = LongTable(table_data, repeatRows=1, colWidths=[
                 0.6*inch, 0.7*inch, 0.5*inch, 0.6*inch, 0.6*inch,
                 0.7*inch, 0.6*inch, 0.7*inch, 0.6*inch, 0.7*inch, 0.7*inch
             ])
             
-            # Style table
-            trade_table.setStyle(TableStyle([
-                # Header row
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#667EEA')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 8),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-                
-                # Data rows
-                ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-                ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-                ('ALIGN', (0, 1), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 7),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F9F9F9')]),
-            ]))
-            
+            # Style table: base commands plus the per-row outcome colors
+            # below, applied with a single setStyle call — one TableStyle
+            # per trade makes reportlab re-walk the accumulated styles at
+            # draw time
+            style_cmds = list(_TRADE_TABLE_BASE_CMDS)
+
             # Color code outcomes in table
             for idx, trade in enumerate(results['trades'], start=1):
-                outcome = trade['outcome']
-                if outcome == 'target_hit':
-                    color = colors.HexColor('#51CF66')
-                elif outcome == 'stop_loss':
-                    color = colors.HexColor('#FF6B6B')
-                else:
-                    color = colors.HexColor('#FFD43B')
-                
-                trade_table.setStyle(TableStyle([
-                    ('BACKGROUND', (7, idx), (7, idx), color),
-                    ('TEXTCOLOR', (7, idx), (7, idx), colors.white if outcome != 'eod_exit' else colors.black),
-                ]))
-            
+                bg, fg = _OUTCOME_STYLE.get(trade['outcome'], _OUTCOME_STYLE['eod_exit'])
+                style_cmds.append(('BACKGROUND', (7, idx), (7, idx), bg))
+                style_cmds.append(('TEXTCOLOR', (7, idx), (7, idx), fg))
+
+            trade_table.setStyle(TableStyle(style_cmds))
             story.append(trade_table)
             
             # Build PDF
             doc.build(story)
             
             pdf_buffer.seek(0)
+
+            # Store raw bytes (not the BytesIO) so each caller gets an
+            # independent stream positioned at zero
+            cache[cache_key] = pdf_buffer.getvalue()
+            while len(cache) > PDFReportGenerator.PDF_CACHE_MAX_ENTRIES:
+                cache.popitem(last=False)
+
             logger.info("✅ PDF report generated successfully")
             
             return pdf_buffer